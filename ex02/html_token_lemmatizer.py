@@ -3,34 +3,59 @@ import os
 import re
 import sys
 import argparse
-from typing import List, Dict, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Set, Tuple, FrozenSet, Optional
 
 import nltk
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 from bs4 import BeautifulSoup
 
 # Ensure NLTK resources are downloaded
-nltk.download('punkt', quiet=True)
-nltk.download('punkt_tab', quiet=True)
 nltk.download('stopwords', quiet=True)
 nltk.download('wordnet', quiet=True)
 
 class HTMLTokenizer:
-    def __init__(self):
+    def __init__(self, backend: str = 'nltk', stop_words: Optional[FrozenSet[str]] = None):
         """
         Initialize the tokenizer with necessary resources
+        
+        Args:
+            backend (str): Lemmatization backend, 'nltk' or 'spacy'
+            stop_words (FrozenSet[str]): Lowercase stopwords, built with
+                default_stop_words() when not given
+        """
+        self.stop_words = stop_words if stop_words is not None else self.default_stop_words()
+        
+        # Whole words of two or more letters; words mixing letters with
+        # digits or underscores are skipped entirely, since the word
+        # boundaries keep any letter run inside them from matching
+        self._token_re = re.compile(r'\b[^\W\d_]{2,}\b')
+
+        # Initialize lemmatizer
+        self.backend = backend
+        self.lemmatizer = WordNetLemmatizer()
+        if backend == 'spacy':
+            # spaCy is optional, only needed for this backend
+            import spacy
+            self.nlp = spacy.load('en_core_web_sm', disable=['parser', 'ner'])
+
+        # Cache of already lemmatized tokens, shared across all processed files
+        self._lemma_cache: Dict[str, str] = {}
+
+    @staticmethod
+    def default_stop_words() -> FrozenSet[str]:
+        """
+        Build the lowercase set of stopwords to filter out
+        
+        Returns:
+            FrozenSet[str]: Comprehensive set of stopwords and additional filter words
         """
-        # Comprehensive set of stopwords and additional filter words
-        self.stop_words = set(stopwords.words('english') + [
+        return frozenset(word.lower() for word in stopwords.words('english') + [
             'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 
             'to', 'for', 'of', 'with', 'by', 'from', 'up', 'about', 
             'into', 'over', 'after', 'beneath', 'under', 'above'
         ])
-        
-        # Initialize lemmatizer
-        self.lemmatizer = WordNetLemmatizer()
 
     def preprocess_html(self, html_content: str) -> str:
         """
@@ -43,8 +68,8 @@ class HTMLTokenizer:
             str: Extracted text from HTML
         """
         try:
-            # Parse HTML and extract text
-            soup = BeautifulSoup(html_content, 'html.parser')
+            # Parse HTML with the C-based lxml backend and extract text
+            soup = BeautifulSoup(html_content, 'lxml')
             
             # Remove script and style elements
             for script in soup(["script", "style"]):
@@ -58,22 +83,6 @@ class HTMLTokenizer:
             print(f"Error preprocessing HTML: {e}")
             return ""
 
-    def is_valid_token(self, token: str) -> bool:
-        """
-        Check if a token is valid
-        
-        Args:
-            token (str): Token to validate
-        
-        Returns:
-            bool: Whether the token is valid
-        """
-        return (
-            len(token) > 1 and  # More than 1 character
-            token.isalpha() and  # Only alphabetic
-            token.lower() not in self.stop_words  # Not a stopword
-        )
-
     def advanced_lemmatize(self, token: str) -> str:
         """
         Perform advanced lemmatization with multiple attempts
@@ -84,6 +93,11 @@ class HTMLTokenizer:
         Returns:
             str: Lemmatized token
         """
+        # WordNet lookups are slow and tokens repeat a lot, so reuse results
+        cached = self._lemma_cache.get(token)
+        if cached is not None:
+            return cached
+
         # Try different lemmatization approaches
         lemma_attempts = [
             self.lemmatizer.lemmatize(token),           # default noun form
@@ -93,7 +107,29 @@ class HTMLTokenizer:
         ]
         
         # Find the shortest lemma (usually the most base form)
-        return min(set(lemma_attempts), key=len)
+        lemma = min(set(lemma_attempts), key=len)
+        self._lemma_cache[token] = lemma
+        return lemma
+
+    def lemmatize_tokens(self, tokens: List[str]) -> List[str]:
+        """
+        Lemmatize a sequence of tokens with the configured backend
+        
+        Args:
+            tokens (List[str]): Tokens to lemmatize
+        
+        Returns:
+            List[str]: Lemma of each token, in the same order
+        """
+        if self.backend == 'spacy':
+            from spacy.tokens import Doc
+            
+            # Feed the tokens as a pre-tokenized doc so spaCy keeps them
+            # one-to-one and tags them in a single batch
+            doc = next(self.nlp.pipe([Doc(self.nlp.vocab, words=tokens)], batch_size=250))
+            return [token.lemma_.lower() for token in doc]
+        
+        return [self.advanced_lemmatize(token) for token in tokens]
 
     def tokenize_file(self, file_path: str) -> Tuple[Set[str], Dict[str, List[str]]]:
         """
@@ -118,22 +154,19 @@ class HTMLTokenizer:
             # Extract text from HTML
             text = self.preprocess_html(html_content)
             
-            # Tokenize
-            tokens = word_tokenize(text.lower())
+            # Tokenize into alphabetic words in a single regex pass
+            tokens = self._token_re.findall(text.lower())
+            
+            # Filter tokens
+            tokens = [token for token in tokens if token not in self.stop_words]
+            unique_tokens.update(tokens)
             
-            # Filter and process tokens
-            for token in tokens:
-                if self.is_valid_token(token):
-                    unique_tokens.add(token)
-                    
-                    # Advanced lemmatization
-                    lemma = self.advanced_lemmatize(token)
-                    
-                    # Group by lemma
-                    if lemma not in lemma_groups:
-                        lemma_groups[lemma] = []
-                    if token not in lemma_groups[lemma]:
-                        lemma_groups[lemma].append(token)
+            # Lemmatize and group by lemma
+            for token, lemma in zip(tokens, self.lemmatize_tokens(tokens)):
+                if lemma not in lemma_groups:
+                    lemma_groups[lemma] = []
+                if token not in lemma_groups[lemma]:
+                    lemma_groups[lemma].append(token)
         
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
@@ -167,40 +200,74 @@ class HTMLTokenizer:
         print(f"Processed {len(unique_tokens)} unique tokens")
         print(f"Grouped into {len(lemma_groups)} lemmas")
 
+# Tokenizer owned by the current worker process, see _init_worker
+_worker_tokenizer = None
+
+def _init_worker(backend: str, stop_words: FrozenSet[str]):
+    """
+    Create one tokenizer per worker process so its lemma cache stays warm
+    across all files handled by that worker
+    
+    Args:
+        backend (str): Lemmatization backend for the tokenizer
+        stop_words (FrozenSet[str]): Stopwords built once by the parent process
+    """
+    global _worker_tokenizer
+    _worker_tokenizer = HTMLTokenizer(backend, stop_words)
+
+def _process_one(job: Tuple[str, str, str]):
+    """
+    Tokenize a single HTML file and write its output files
+    
+    Args:
+        job (tuple): (file path, tokens output path, lemmas output path)
+    """
+    file_path, tokens_output, lemmas_output = job
+    
+    # Tokenize the file
+    unique_tokens, lemma_groups = _worker_tokenizer.tokenize_file(file_path)
+    
+    # Write output files
+    _worker_tokenizer.write_output(unique_tokens, lemma_groups, 
+                                   tokens_output, lemmas_output)
+
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Tokenize and lemmatize HTML files')
     parser.add_argument('input_dir', help='Directory containing HTML files')
+    parser.add_argument('--backend', choices=['nltk', 'spacy'], default='nltk',
+                        help='Lemmatization backend (default: nltk)')
     
     # Parse arguments
     args = parser.parse_args()
     
-    # Create tokenizer instance
-    tokenizer = HTMLTokenizer()
-    
-    # Process files
-    for filename in os.listdir(args.input_dir):
+    # Collect files to process
+    jobs = []
+    with os.scandir(args.input_dir) as entries:
+        html_files = [entry for entry in entries
+                      if entry.name.endswith('.html') and entry.is_file()]
+    for entry in html_files:
         # Check if filename matches {number}.html pattern
-        match = re.match(r'^(\d+)\.html$', filename)
-        if not match:
+        file_number = entry.name[:-len('.html')]
+        if not file_number.isdigit():
             continue
         
-        # Get the file number
-        file_number = match.group(1)
-        
-        # Construct full file path
-        file_path = os.path.join(args.input_dir, filename)
+        # Full file path comes with the directory entry
+        file_path = entry.path
         
         # Generate output file paths
         tokens_output = os.path.join(args.input_dir, f'tokens_{file_number}.txt')
         lemmas_output = os.path.join(args.input_dir, f'lemmas_{file_number}.txt')
         
-        # Tokenize the file
-        unique_tokens, lemma_groups = tokenizer.tokenize_file(file_path)
-        
-        # Write output files
-        tokenizer.write_output(unique_tokens, lemma_groups, 
-                               tokens_output, lemmas_output)
+        jobs.append((file_path, tokens_output, lemmas_output))
+    
+    # Files are independent and processing is CPU-bound, so spread them
+    # over worker processes
+    chunksize = max(1, len(jobs) // (4 * (os.cpu_count() or 1)))
+    stop_words = HTMLTokenizer.default_stop_words()
+    with ProcessPoolExecutor(initializer=_init_worker,
+                             initargs=(args.backend, stop_words)) as executor:
+        list(executor.map(_process_one, jobs, chunksize=chunksize))
 
 if __name__ == '__main__':
     main()
@@ -2,99 +2,234 @@ import os
 import re
 import sys
 import json
+import pickle
 import argparse
 from collections import defaultdict
 
+import numpy as np
+
+EMPTY_POSTINGS = np.empty(0, dtype=np.uint32)
+
 class SearchEngine:
     def __init__(self, directory_path):
         """Initialize the search engine with the specified directory."""
         self.directory_path = directory_path
         self.doc_urls = {}  # Maps document number to URL
-        self.inverted_index = defaultdict(set)  # Maps terms to document numbers
-        self.index_file = os.path.join(directory_path, "inverted_index.json")
+        self.inverted_index = {}  # Maps terms to sorted arrays of document numbers
+        self.all_docs = EMPTY_POSTINGS  # Sorted array of all document numbers
+        self.doc_terms = {}  # Maps document number to the terms it contributed
+        self.manifest = {}  # Maps document number to mtimes of its files when indexed
+        self.build_state_loaded = False  # Whether doc_terms and manifest are loaded
+        # The index is stored as a packed postings list:
+        #   meta     - pickled document URLs and the sorted list of terms
+        #   offsets  - uint32 start of each term's postings, plus the total length
+        #   postings - sorted uint32 document numbers of all terms, concatenated
+        # Searching needs only these. The per-document state used for
+        # incremental builds is pickled separately, and only build_index reads it.
+        index_prefix = os.path.join(directory_path, "inverted_index")
+        self.meta_file = f"{index_prefix}.pkl"
+        self.offsets_file = f"{index_prefix}.offsets.bin"
+        self.postings_file = f"{index_prefix}.postings.bin"
+        self.index_files = [self.meta_file, self.offsets_file, self.postings_file]
+        self.build_state_file = f"{index_prefix}.state.pkl"
+        # Index written by older versions as a single JSON file
+        self.legacy_index_file = f"{index_prefix}.json"
         
         # Try to load existing index if it exists, otherwise build it
-        if os.path.exists(self.index_file):
+        if all(os.path.exists(path) for path in self.index_files):
             self.load_index()
+        elif os.path.exists(self.legacy_index_file):
+            self.load_legacy_index()
+            self.save_index()
         else:
             self.build_index()
             self.save_index()
 
+    def _doc_mtimes(self, doc_number):
+        """Return modification times of a document's tokens and lemmas files."""
+        mtimes = []
+        for prefix in ("tokens", "lemmas"):
+            try:
+                mtimes.append(os.stat(os.path.join(self.directory_path, f"{prefix}_{doc_number}.txt")).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _read_doc_terms(self, doc_number):
+        """Read the set of tokens and lemmas of a single document."""
+        terms = []
+        tokens_file = os.path.join(self.directory_path, f"tokens_{doc_number}.txt")
+        lemmas_file = os.path.join(self.directory_path, f"lemmas_{doc_number}.txt")
+        
+        # Collect tokens, one per line
+        try:
+            with open(tokens_file, 'r', encoding='utf-8') as f:
+                terms.extend(f.read().split())
+        except FileNotFoundError:
+            print(f"Warning: tokens file not found for document {doc_number}")
+        
+        # Collect lemmas, the first word of each line
+        try:
+            with open(lemmas_file, 'r', encoding='utf-8') as f:
+                terms.extend(line.split(maxsplit=1)[0] for line in f.read().splitlines() if line.strip())
+        except FileNotFoundError:
+            print(f"Warning: lemmas file not found for document {doc_number}")
+        
+        # Intern terms so every document (and the index keys built from them)
+        # shares a single string object per distinct term
+        return {sys.intern(term) for term in terms}
+
+    def load_build_state(self):
+        """Load the per-document terms and mtimes saved by the last build, if any."""
+        if self.build_state_loaded:
+            return
+        self.build_state_loaded = True
+        try:
+            with open(self.build_state_file, 'rb') as f:
+                state = pickle.load(f)
+            self.doc_terms = state["doc_terms"]
+            self.manifest = state["manifest"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading build state: {e}")
+            self.doc_terms = {}
+            self.manifest = {}
+
     def build_index(self):
-        """Build the inverted index from the files in the directory."""
+        """
+        Build the inverted index from the files in the directory.
+        Only documents whose files changed since the last build are re-read.
+        """
         print("Building inverted index...")
+        self.load_build_state()
         # First, read the index.txt file to get document numbers and URLs
         index_file_path = os.path.join(self.directory_path, "index.txt")
+        doc_urls = {}
         try:
             with open(index_file_path, 'r', encoding='utf-8') as f:
                 for line in f:
                     parts = line.strip().split(maxsplit=1)
                     if len(parts) == 2:
                         doc_number, url = parts
-                        self.doc_urls[doc_number] = url
+                        doc_urls[int(doc_number)] = url
         except FileNotFoundError:
             print(f"Error: index.txt not found in {self.directory_path}")
             return
 
-        # For each document, read tokens and add to the inverted index
-        for doc_number in self.doc_urls:
-            tokens_file = os.path.join(self.directory_path, f"tokens_{doc_number}.txt")
-            lemmas_file = os.path.join(self.directory_path, f"lemmas_{doc_number}.txt")
-            
-            # Add tokens to the inverted index
-            try:
-                with open(tokens_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        token = line.strip()
-                        if token:
-                            self.inverted_index[token].add(doc_number)
-            except FileNotFoundError:
-                print(f"Warning: tokens file not found for document {doc_number}")
-            
-            # Add lemmas to the inverted index
-            try:
-                with open(lemmas_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        parts = line.strip().split()
-                        if len(parts) >= 1:
-                            lemma = parts[0]
-                            self.inverted_index[lemma].add(doc_number)
-            except FileNotFoundError:
-                print(f"Warning: lemmas file not found for document {doc_number}")
+        # Drop documents that are no longer listed in index.txt
+        for doc_number in list(self.doc_terms):
+            if doc_number not in doc_urls:
+                del self.doc_terms[doc_number]
+                self.manifest.pop(doc_number, None)
+
+        # Re-read the terms of changed documents
+        updated = 0
+        for doc_number in doc_urls:
+            mtimes = self._doc_mtimes(doc_number)
+            if self.manifest.get(doc_number) == mtimes and doc_number in self.doc_terms:
+                continue
+            self.doc_terms[doc_number] = tuple(self._read_doc_terms(doc_number))
+            self.manifest[doc_number] = mtimes
+            updated += 1
+        
+        # Invert the per-document terms in a single pass. Documents are
+        # visited in order and contribute each term once, so every postings
+        # list comes out sorted and free of duplicates.
+        postings = defaultdict(list)
+        for doc_number in sorted(self.doc_terms):
+            for term in self.doc_terms[doc_number]:
+                postings[term].append(doc_number)
         
-        print(f"Inverted index built with {len(self.inverted_index)} terms.")
+        # Freeze postings into sorted arrays of document numbers
+        self.doc_urls = doc_urls
+        self.inverted_index = {
+            term: np.array(docs, dtype=np.uint32)
+            for term, docs in postings.items()
+        }
+        
+        self.all_docs = np.array(sorted(self.doc_urls), dtype=np.uint32)
+        
+        print(f"Inverted index built with {len(self.inverted_index)} terms "
+              f"({updated} documents updated).")
 
     def save_index(self):
-        """Save the inverted index to a file."""
-        print(f"Saving inverted index to {self.index_file}...")
-        # Convert sets to lists for JSON serialization
-        serializable_index = {
-            "doc_urls": self.doc_urls,
-            "inverted_index": {term: list(docs) for term, docs in self.inverted_index.items()}
-        }
+        """Save the inverted index as a packed postings list."""
+        print(f"Saving inverted index to {self.postings_file}...")
+        terms = sorted(self.inverted_index)
+        offsets = np.zeros(len(terms) + 1, dtype=np.uint32)
+        np.cumsum([len(self.inverted_index[term]) for term in terms], out=offsets[1:])
         
         try:
-            with open(self.index_file, 'w', encoding='utf-8') as f:
-                json.dump(serializable_index, f)
+            # Write everything next to the index first and swap the files in
+            # at the end, so readers (and our own memory map of the previous
+            # postings) never see a partially written index
+            with open(f"{self.meta_file}.tmp", 'wb') as f:
+                pickle.dump({"doc_urls": self.doc_urls, "terms": terms},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            offsets.tofile(f"{self.offsets_file}.tmp")
+            with open(f"{self.postings_file}.tmp", 'wb') as f:
+                for term in terms:
+                    self.inverted_index[term].tofile(f)
+            for path in self.index_files:
+                os.replace(f"{path}.tmp", path)
+            # Only a build knows the per-document state worth keeping
+            if self.build_state_loaded:
+                with open(f"{self.build_state_file}.tmp", 'wb') as f:
+                    pickle.dump({"doc_terms": self.doc_terms, "manifest": self.manifest},
+                                f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(f"{self.build_state_file}.tmp", self.build_state_file)
             print("Index saved successfully.")
         except Exception as e:
             print(f"Error saving index: {e}")
 
     def load_index(self):
-        """Load the inverted index from a file."""
-        print(f"Loading inverted index from {self.index_file}...")
+        """Load the inverted index, memory-mapping the postings."""
+        print(f"Loading inverted index from {self.postings_file}...")
+        try:
+            with open(self.meta_file, 'rb') as f:
+                meta = pickle.load(f)
+            self.doc_urls = meta["doc_urls"]
+            terms = meta["terms"]
+            offsets = np.fromfile(self.offsets_file, dtype=np.uint32)
+            if os.path.getsize(self.postings_file):
+                postings = np.memmap(self.postings_file, dtype=np.uint32, mode='r')
+            else:
+                # Empty files cannot be memory-mapped
+                postings = EMPTY_POSTINGS
+            self.all_docs = np.array(sorted(self.doc_urls), dtype=np.uint32)
+            # Terms map to views into the mapped postings, nothing is copied
+            self.inverted_index = {
+                term: postings[offsets[i]:offsets[i + 1]]
+                for i, term in enumerate(terms)
+            }
+            print(f"Index loaded with {len(self.inverted_index)} terms.")
+        except Exception as e:
+            print(f"Error loading index: {e}")
+            # If loading fails, build the index from scratch
+            self.doc_terms = {}
+            self.manifest = {}
+            self.build_state_loaded = True
+            self.build_index()
+            self.save_index()
+
+    def load_legacy_index(self):
+        """Load an inverted index saved by older versions as JSON."""
+        print(f"Loading inverted index from {self.legacy_index_file}...")
         try:
-            with open(self.index_file, 'r', encoding='utf-8') as f:
+            with open(self.legacy_index_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                self.doc_urls = data["doc_urls"]
-                # Convert lists back to sets
-                self.inverted_index = {term: set(docs) for term, docs in data["inverted_index"].items()}
+            self.doc_urls = {int(doc_number): url for doc_number, url in data["doc_urls"].items()}
+            self.all_docs = np.array(sorted(self.doc_urls), dtype=np.uint32)
+            self.inverted_index = {
+                term: np.array(sorted(int(doc) for doc in docs), dtype=np.uint32)
+                for term, docs in data["inverted_index"].items()
+            }
             print(f"Index loaded with {len(self.inverted_index)} terms.")
         except Exception as e:
             print(f"Error loading index: {e}")
             # If loading fails, build the index
             self.build_index()
-            self.save_index()
 
     def _tokenize_query(self, query):
         """Tokenize a query into operators and terms."""
@@ -104,10 +239,38 @@ class SearchEngine:
         tokens = query.split()
         return tokens
 
+    @staticmethod
+    def _intersect(left, right):
+        """Intersect two sorted postings by binary-searching the longer one."""
+        if len(left) > len(right):
+            left, right = right, left
+        if not len(left):
+            return left
+        positions = np.searchsorted(right, left)
+        return left[right.take(positions, mode='clip') == left]
+
+    @staticmethod
+    def _union(left, right):
+        """Merge two sorted postings into one without duplicates."""
+        merged = np.concatenate((left, right))
+        # A stable sort merges the two sorted runs in linear time
+        merged.sort(kind='stable')
+        if not len(merged):
+            return merged
+        return merged[np.concatenate(([True], merged[1:] != merged[:-1]))]
+
+    @staticmethod
+    def _difference(left, right):
+        """Return the documents of sorted postings left that are not in right."""
+        if not len(left) or not len(right):
+            return left
+        positions = np.searchsorted(right, left)
+        return left[right.take(positions, mode='clip') != left]
+
     def _evaluate_boolean_expression(self, tokens):
         """
         Evaluate a boolean expression using the Shunting Yard algorithm.
-        Returns a set of document IDs that match the query.
+        Returns a sorted array of document IDs that match the query.
         """
         output_queue = []
         operator_stack = []
@@ -145,32 +308,31 @@ class SearchEngine:
         
         # Evaluate the RPN expression
         eval_stack = []
-        all_docs = set(self.doc_urls.keys())
         
         for token in output_queue:
             if token == 'AND':
                 if len(eval_stack) >= 2:
                     right = eval_stack.pop()
                     left = eval_stack.pop()
-                    eval_stack.append(left.intersection(right))
+                    eval_stack.append(self._intersect(left, right))
                 else:
                     raise ValueError("Invalid boolean expression: not enough operands for AND operator")
             elif token == 'OR':
                 if len(eval_stack) >= 2:
                     right = eval_stack.pop()
                     left = eval_stack.pop()
-                    eval_stack.append(left.union(right))
+                    eval_stack.append(self._union(left, right))
                 else:
                     raise ValueError("Invalid boolean expression: not enough operands for OR operator")
             elif token == 'NOT':
                 if eval_stack:
                     operand = eval_stack.pop()
-                    eval_stack.append(all_docs - operand)
+                    eval_stack.append(self._difference(self.all_docs, operand))
                 else:
                     raise ValueError("Invalid boolean expression: not enough operands for NOT operator")
             else:
-                # It's a term, push the set of documents containing it
-                eval_stack.append(self.inverted_index.get(token, set()))
+                # It's a term, push the documents containing it
+                eval_stack.append(self.inverted_index.get(token, EMPTY_POSTINGS))
         
         if len(eval_stack) == 1:
             return eval_stack[0]
@@ -185,7 +347,7 @@ class SearchEngine:
         tokens = self._tokenize_query(query)
         try:
             result_doc_ids = self._evaluate_boolean_expression(tokens)
-            return [(doc_id, self.doc_urls[doc_id]) for doc_id in result_doc_ids]
+            return [(int(doc_id), self.doc_urls[int(doc_id)]) for doc_id in result_doc_ids]
         except ValueError as e:
             print(f"Error: {e}")
             return []
@@ -195,7 +357,7 @@ def main():
     parser = argparse.ArgumentParser(description="Boolean search engine for document collection")
     parser.add_argument("--input-dir", required=True, help="Directory containing the document collection")
     parser.add_argument("query", nargs='+', help="Boolean search query")
-    parser.add_argument("--rebuild-index", action="store_true", help="Force rebuilding the index even if it exists")
+    parser.add_argument("--rebuild-index", action="store_true", help="Rebuild the index, re-reading documents changed since the last build")
     
     args = parser.parse_args()
     
@@ -1,6 +1,9 @@
 import os
-import math
 import collections
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+import scipy.sparse as sp
 from nltk.stem import WordNetLemmatizer
 from nltk.corpus import wordnet
 import nltk
@@ -8,78 +11,127 @@ import nltk
 nltk.download("wordnet")
 nltk.download("omw-1.4")
 
+lemmatizer = WordNetLemmatizer()
+
 def read_tokens(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return [line.strip() for line in f if line.strip()]
 
-def compute_tf(tokens):
-    total_terms = len(tokens)
-    counts = collections.Counter(tokens)
-    return {term: count / total_terms for term, count in counts.items()}
-
-def compute_idf(documents):
-    """documents: list of sets of unique terms or lemmas from each doc"""
-    N = len(documents)
-    idf = {}
-    all_terms = set(term for doc in documents for term in doc)
-    for term in all_terms:
-        containing_docs = sum(1 for doc in documents if term in doc)
-        idf[term] = math.log(N / (1 + containing_docs)) + 1
-    return idf
+def build_count_matrix(documents):
+    """documents: list of token lists, one per doc.
+    Returns the sorted vocabulary and a CSR matrix (docs x vocabulary) of raw counts."""
+    vocab = sorted(set().union(*documents))
+    term_to_col = {term: i for i, term in enumerate(vocab)}
+    indptr = [0]
+    indices = []
+    data = []
+    for tokens in documents:
+        for term, count in sorted(collections.Counter(tokens).items()):
+            indices.append(term_to_col[term])
+            data.append(count)
+        indptr.append(len(indices))
+    counts = sp.csr_matrix((np.array(data, dtype=np.float64), indices, indptr),
+                           shape=(len(documents), len(vocab)))
+    return vocab, counts
+
+def compute_tf(counts):
+    """Normalize each row of the count matrix by the number of terms in its doc."""
+    row_sums = np.asarray(counts.sum(axis=1)).ravel()
+    tf = counts.copy()
+    tf.data /= np.repeat(row_sums, np.diff(tf.indptr))
+    return tf
+
+def compute_idf(counts):
+    """IDF of every vocabulary column of the count matrix"""
+    N = counts.shape[0]
+    # Every stored entry is one (doc, term) occurrence, so document frequency
+    # is just how often each column index appears
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    return np.log(N / (1 + df)) + 1
+
+@lru_cache(maxsize=200_000)
+def lemmatize_token(token):
+    # WordNet lookups are slow and the same tokens show up in many docs
+    return lemmatizer.lemmatize(token)
 
 def lemmatize_tokens(tokens):
-    lemmatizer = WordNetLemmatizer()
-    return [lemmatizer.lemmatize(token) for token in tokens]
+    return [lemmatize_token(token) for token in tokens]
+
+def lemmatize_documents(documents, backend="nltk", executor=None):
+    """Lemmatize every token list in documents with the chosen backend ("nltk" or "spacy").
+    With the nltk backend documents are spread over executor's workers when one is given."""
+    if backend == "spacy":
+        # spaCy is optional, only needed for this backend
+        import spacy
+        from spacy.tokens import Doc
+        nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
+        # Pre-tokenized docs keep tokens one-to-one, pipe batches the tagging
+        docs = nlp.pipe((Doc(nlp.vocab, words=tokens) for tokens in documents), batch_size=250)
+        return [[token.lemma_.lower() for token in doc] for doc in docs]
+    if executor is not None:
+        return list(executor.map(lemmatize_tokens, documents, chunksize=32))
+    return [lemmatize_tokens(tokens) for tokens in documents]
+
+def write_tfidf_file(job):
+    """job: (path, terms, idf values, tf-idf values) of a single output file"""
+    path, terms, idfs, tfidfs = job
+    # Format the whole file and write it at once
+    lines = [f"{term} {idf:.6f} {tfidf:.6f}\n" for term, idf, tfidf in zip(terms, idfs, tfidfs)]
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write("".join(lines))
 
-def process_directory(input_dir, output_dir):
+def write_lemma_map(path, term_docs, lemma_docs):
+    """Write the lemma of every surface form seen in the documents, one "term lemma" pair per line"""
+    lemma_map = {}
+    for tokens, lemmas in zip(term_docs, lemma_docs):
+        lemma_map.update(zip(tokens, lemmas))
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write("".join(f"{term} {lemma}\n" for term, lemma in sorted(lemma_map.items())))
+
+def process_directory(input_dir, output_dir, backend="nltk"):
     os.makedirs(output_dir, exist_ok=True)
 
     file_map = {}  # {number: tokens}
-    for fname in os.listdir(input_dir):
-        if fname.startswith("tokens_") and fname.endswith(".txt"):
-            number = fname.replace("tokens_", "").replace(".txt", "")
-            tokens = read_tokens(os.path.join(input_dir, fname))
-            file_map[number] = tokens
-
-    # TF for terms and lemmas
-    term_tfs = {}
-    lemma_tfs = {}
-    term_sets = []
-    lemma_sets = []
-
-    for num, tokens in file_map.items():
-        term_tf = compute_tf(tokens)
-        lemmas = lemmatize_tokens(tokens)
-        lemma_tf = compute_tf(lemmas)
-
-        term_tfs[num] = term_tf
-        lemma_tfs[num] = lemma_tf
-
-        term_sets.append(set(term_tf.keys()))
-        lemma_sets.append(set(lemma_tf.keys()))
-
-    # IDF across all documents
-    term_idf = compute_idf(term_sets)
-    lemma_idf = compute_idf(lemma_sets)
-
-    # Save TF-IDF files
-    for num in file_map:
-        with open(os.path.join(output_dir, f"tfidf_terms_{num}.txt"), "w", encoding="utf-8") as f:
-            for term, tf in term_tfs[num].items():
-                idf = term_idf.get(term, 0)
-                tfidf = tf * idf
-                f.write(f"{term} {idf:.6f} {tfidf:.6f}\n")
-
-        with open(os.path.join(output_dir, f"tfidf_lemmas_{num}.txt"), "w", encoding="utf-8") as f:
-            for lemma, tf in lemma_tfs[num].items():
-                idf = lemma_idf.get(lemma, 0)
-                tfidf = tf * idf
-                f.write(f"{lemma} {idf:.6f} {tfidf:.6f}\n")
+    with os.scandir(input_dir) as entries:
+        token_files = [entry for entry in entries
+                       if entry.name.startswith("tokens_") and entry.name.endswith(".txt") and entry.is_file()]
+    for entry in token_files:
+        number = entry.name[len("tokens_"):-len(".txt")]
+        file_map[number] = read_tokens(entry.path)
+
+    nums = list(file_map)
+    term_docs = [file_map[num] for num in nums]
+
+    # Lemmatization and formatting of output files are independent per doc,
+    # so both run on worker processes
+    with ProcessPoolExecutor() as executor:
+        lemma_docs = lemmatize_documents(term_docs, backend, executor)
+        # Lets search map query words to lemmas without lemmatizing them
+        write_lemma_map(os.path.join(output_dir, "lemma_map.txt"), term_docs, lemma_docs)
+
+        for kind, documents in (("terms", term_docs), ("lemmas", lemma_docs)):
+            # TF and IDF across all documents
+            vocab, counts = build_count_matrix(documents)
+            tf = compute_tf(counts)
+            idf = compute_idf(counts)
+            tfidf = tf.data * idf[tf.indices]
+
+            # Save TF-IDF files
+            jobs = []
+            for row, num in enumerate(nums):
+                start, end = tf.indptr[row], tf.indptr[row + 1]
+                cols = tf.indices[start:end]
+                jobs.append((os.path.join(output_dir, f"tfidf_{kind}_{num}.txt"),
+                             [vocab[col] for col in cols.tolist()],
+                             idf[cols].tolist(),
+                             tfidf[start:end].tolist()))
+            list(executor.map(write_tfidf_file, jobs, chunksize=32))
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Calculate TF-IDF for terms and lemmas.")
     parser.add_argument("input_dir", help="Directory with tokens_{number}.txt files")
     parser.add_argument("output_dir", help="Directory to save tf-idf result files")
+    parser.add_argument("--backend", choices=["nltk", "spacy"], default="nltk", help="Lemmatization backend")
     args = parser.parse_args()
-    process_directory(args.input_dir, args.output_dir)
+    process_directory(args.input_dir, args.output_dir, args.backend)
@@ -1,34 +1,70 @@
 import os
-import math
+import re
 import argparse
 from collections import defaultdict
+from functools import lru_cache
 from typing import Dict, List, Tuple
 
-def load_tfidf_vectors(directory: str, use_lemmas: bool = True) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
+import numpy as np
+import scipy.sparse as sp
+from nltk.stem import WordNetLemmatizer
+
+# Same token rule as the indexer: whole words of two or more letters
+TOKEN_RE = re.compile(r"\b[^\W\d_]{2,}\b")
+
+lemmatizer = WordNetLemmatizer()
+
+@lru_cache(maxsize=50_000)
+def lemmatize(token: str) -> str:
+    """Lemmatize a single token, caching the WordNet lookup."""
+    return lemmatizer.lemmatize(token)
+
+def load_tfidf_vectors(directory: str, use_lemmas: bool = True) -> Tuple[sp.csr_matrix, List[str], Dict[str, int], Dict[str, float]]:
     """
     Load TF-IDF vectors from files.
     Returns:
-        - doc_vectors: Dictionary mapping document numbers to their term/lemma vectors
+        - doc_matrix: CSR matrix with one L2-normalized TF-IDF row per document
+        - doc_nums: Document number of each matrix row
+        - vocab_index: Dictionary mapping terms/lemmas to matrix columns
         - idf_weights: Dictionary mapping terms/lemmas to their IDF weights
     """
-    doc_vectors = {}
+    doc_nums = []
+    vocab_index = {}
     idf_weights = {}
+    indptr = [0]
+    indices = []
+    data = []
     
     prefix = "tfidf_lemmas_" if use_lemmas else "tfidf_terms_"
     
     for filename in os.listdir(directory):
         if filename.startswith(prefix) and filename.endswith(".txt"):
             doc_num = filename.replace(prefix, "").replace(".txt", "")
-            doc_vectors[doc_num] = {}
+            doc_nums.append(doc_num)
             
             with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
                 for line in f:
                     term, idf, tfidf = line.strip().split()
-                    doc_vectors[doc_num][term] = float(tfidf)
-                    if term not in idf_weights:
+                    col = vocab_index.get(term)
+                    if col is None:
+                        col = len(vocab_index)
+                        vocab_index[term] = col
                         idf_weights[term] = float(idf)
+                    indices.append(col)
+                    data.append(float(tfidf))
+            indptr.append(len(indices))
+    
+    doc_matrix = sp.csr_matrix(
+        (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(doc_nums), len(vocab_index)),
+    )
     
-    return doc_vectors, idf_weights
+    # Normalize rows once, so a dot product with a unit query is the cosine
+    row_norms = np.sqrt(np.asarray(doc_matrix.multiply(doc_matrix).sum(axis=1)).ravel())
+    row_norms[row_norms == 0] = 1.0
+    doc_matrix.data /= np.repeat(row_norms, np.diff(doc_matrix.indptr))
+    
+    return doc_matrix, doc_nums, vocab_index, idf_weights
 
 def load_urls(index_file: str) -> Dict[str, str]:
     """Load document numbers to URLs mapping from index file."""
@@ -41,14 +77,10 @@ def load_urls(index_file: str) -> Dict[str, str]:
 
 def compute_query_vector(query: str, idf_weights: Dict[str, float], use_lemmas: bool = True) -> Dict[str, float]:
     """Convert query into TF-IDF vector."""
-    from nltk.stem import WordNetLemmatizer
-    from nltk.tokenize import word_tokenize
-    
     # Tokenize and optionally lemmatize query
-    tokens = word_tokenize(query.lower())
+    tokens = TOKEN_RE.findall(query.lower())
     if use_lemmas:
-        lemmatizer = WordNetLemmatizer()
-        tokens = [lemmatizer.lemmatize(token) for token in tokens]
+        tokens = [lemmatize(token) for token in tokens]
     
     # Compute TF
     tf = defaultdict(int)
@@ -65,32 +97,31 @@ def compute_query_vector(query: str, idf_weights: Dict[str, float], use_lemmas:
     
     return query_vector
 
-def cosine_similarity(vec1: Dict[str, float], vec2: Dict[str, float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    dot_product = sum(vec1.get(term, 0) * vec2.get(term, 0) for term in set(vec1.keys()) | set(vec2.keys()))
-    norm1 = math.sqrt(sum(val**2 for val in vec1.values()))
-    norm2 = math.sqrt(sum(val**2 for val in vec2.values()))
-    
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    return dot_product / (norm1 * norm2)
-
-def search(query: str, doc_vectors: Dict[str, Dict[str, float]], 
-          idf_weights: Dict[str, float], urls: Dict[str, str],
+def search(query: str, doc_matrix: sp.csr_matrix, doc_nums: List[str],
+          vocab_index: Dict[str, int], idf_weights: Dict[str, float], urls: Dict[str, str],
           top_k: int = 10, use_lemmas: bool = True) -> List[Tuple[str, str, float]]:
     """Search for documents most relevant to the query."""
     query_vector = compute_query_vector(query, idf_weights, use_lemmas)
+    if not query_vector:
+        return []
+    
+    # Build the query as a unit-length dense vector over the same vocabulary
+    cols = np.array([vocab_index[term] for term in query_vector], dtype=np.int32)
+    vals = np.array(list(query_vector.values()), dtype=np.float64)
+    query_dense = np.zeros(doc_matrix.shape[1])
+    query_dense[cols] = vals / np.linalg.norm(vals)
     
-    # Compute similarity scores
-    scores = []
-    for doc_num, doc_vector in doc_vectors.items():
-        score = cosine_similarity(query_vector, doc_vector)
-        if score > 0:  # Only include documents with non-zero similarity
-            scores.append((doc_num, urls.get(doc_num, "Unknown URL"), score))
+    # Cosine similarity with every document in one compiled CSR
+    # matrix-vector product, straight into a dense score array
+    scores = doc_matrix @ query_dense
     
-    # Sort by score in descending order
-    scores.sort(key=lambda x: x[2], reverse=True)
-    return scores[:top_k]
+    # Select the top_k best scores in linear time and sort only those
+    order = np.arange(len(scores))
+    if top_k < len(scores):
+        order = np.argpartition(-scores, top_k - 1)[:top_k]
+    order = order[np.argsort(-scores[order], kind="stable")]
+    return [(doc_nums[i], urls.get(doc_nums[i], "Unknown URL"), float(scores[i]))
+            for i in order if scores[i] > 0]  # Only include documents with non-zero similarity
 
 def main():
     parser = argparse.ArgumentParser(description="Search documents using TF-IDF vectors")
@@ -103,11 +134,12 @@ def main():
     args = parser.parse_args()
     
     # Load vectors and URLs
-    doc_vectors, idf_weights = load_tfidf_vectors(args.tfidf_dir, args.use_lemmas)
+    doc_matrix, doc_nums, vocab_index, idf_weights = load_tfidf_vectors(args.tfidf_dir, args.use_lemmas)
     urls = load_urls(args.index_file)
     
     # Perform search
-    results = search(args.query, doc_vectors, idf_weights, urls, args.top_k, args.use_lemmas)
+    results = search(args.query, doc_matrix, doc_nums, vocab_index, idf_weights, urls,
+                     args.top_k, args.use_lemmas)
     
     # Print results
     print(f"\nSearch results for query: '{args.query}'")
@@ -1,46 +1,212 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request
+from flask_compress import Compress
 import os
-from typing import Dict, List, Tuple
-from collections import defaultdict
-import math
+import re
+import pickle
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+import orjson
+import scipy.sparse as sp
+from numba import njit
 import nltk
 from nltk.stem import WordNetLemmatizer
-from nltk.tokenize import word_tokenize
-from nltk.corpus import wordnet
-
-# Download required NLTK data
-nltk.download('punkt')
-nltk.download('wordnet')
-nltk.download('omw-1.4')
-nltk.download('averaged_perceptron_tagger')
+from nltk.tag import PerceptronTagger
+from nltk.corpus.reader.wordnet import ADJ, NOUN, VERB, ADV
 
 app = Flask(__name__)
+# gzip responses
+Compress(app)
+
+# Same token rule as the indexer: whole words of two or more letters
+TOKEN_RE = re.compile(r"\b[^\W\d_]{2,}\b")
+
+# Maps the first letter of a Penn Treebank POS tag to the WordNet POS
+_TAG_MAP = {"J": ADJ, "N": NOUN, "V": VERB, "R": ADV}
+
+_LEMMATIZER = WordNetLemmatizer()
+
+# Built once by init_app: nltk.pos_tag loads the tagger model from disk on
+# every call
+_TAGGER: Optional[PerceptronTagger] = None
+
+@lru_cache(maxsize=50_000)
+def _lemmatize(token: str, pos: str) -> str:
+    """Lemmatize a token with the given WordNet POS, caching the lookup."""
+    return _LEMMATIZER.lemmatize(token, pos)
+
+@dataclass(slots=True)
+class Index:
+    """
+    Everything search needs as flat arrays: a CSR matrix with one L2-normalized
+    TF-IDF row per document, postings of the rare terms, data of each row and
+    data of each term id.
+    """
+    indptr: np.ndarray  # Start of each row in indices and data
+    indices: np.ndarray  # Sorted term ids of each row
+    data: np.ndarray  # TF-IDF weight of each entry
+    all_rows: np.ndarray  # 0..n_docs-1, the rows scored for broad queries
+    doc_freq: np.ndarray  # Number of documents containing each term id
+    postings_indptr: np.ndarray  # Start of each term's postings, empty for common terms
+    postings_rows: np.ndarray  # Sorted rows of the documents containing each rare term
+    doc_ids: np.ndarray  # Document number of each row
+    urls: np.ndarray  # URL of each row
+    vocab: Dict[str, int]  # Maps term to its id, which is also its matrix column
+    idf: np.ndarray  # IDF weight of each term id
+    surface_ids: Dict[str, int]  # Maps words seen in the corpus to the id of their lemma
+
+def _ensure_nltk():
+    """Download the NLTK data used for queries, skipping what is already installed."""
+    # Since NLTK 3.9 pos_tag loads the tagger from its "_eng" package
+    nltk_version = tuple(int(part) for part in re.findall(r"\d+", nltk.__version__)[:2])
+    tagger = 'averaged_perceptron_tagger_eng' if nltk_version >= (3, 9) else 'averaged_perceptron_tagger'
+    needed = [
+        ('corpora/wordnet', 'wordnet'),
+        ('corpora/omw-1.4', 'omw-1.4'),
+        (f'taggers/{tagger}', tagger),
+    ]
+    for path, package in needed:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(package, quiet=True)
+
+# Index loaded by init_app
+search_index: Optional[Index] = None
 
-# Global variables to store loaded data
-doc_vectors = {}
-idf_weights = {}
-urls = {}
+def _parse_tfidf_file(path: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Parse one TF-IDF file into its terms, IDF values and TF-IDF values."""
+    with open(path, "r", encoding="utf-8") as f:
+        fields = f.read().split()
+    # Every line is "term idf tfidf"
+    return (fields[0::3],
+            np.array(fields[1::3], dtype=np.float64),
+            np.array(fields[2::3], dtype=np.float64))
 
-def load_tfidf_vectors(directory: str, use_lemmas: bool = True) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
-    """Load TF-IDF vectors from files."""
-    doc_vectors = {}
-    idf_weights = {}
+def load_tfidf_vectors(directory: str, use_lemmas: bool = True) -> Tuple[
+        sp.csr_matrix, List[str], Dict[str, int], np.ndarray]:
+    """
+    Load TF-IDF vectors from files into a sparse matrix with L2-normalized rows.
+    Returns the matrix, the document number of each row, the term to id
+    mapping and the IDF weight of each term id.
+    """
+    doc_index = []
+    vocab = {}
+    idf_weights = []
+    rows = []
+    cols = []
+    values = []
     
     prefix = "tfidf_lemmas_" if use_lemmas else "tfidf_terms_"
+    filenames = [filename for filename in os.listdir(directory)
+                 if filename.startswith(prefix) and filename.endswith(".txt")]
     
-    for filename in os.listdir(directory):
-        if filename.startswith(prefix) and filename.endswith(".txt"):
+    # Reading is I/O bound, so files are parsed on a thread pool while the
+    # vocabulary is merged here in file order
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        parsed = executor.map(_parse_tfidf_file,
+                              [os.path.join(directory, filename) for filename in filenames])
+        for filename, (terms, idfs, tfidfs) in zip(filenames, parsed):
             doc_num = filename.replace(prefix, "").replace(".txt", "")
-            doc_vectors[doc_num] = {}
+            row = len(doc_index)
+            doc_index.append(doc_num)
             
-            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
-                for line in f:
-                    term, idf, tfidf = line.strip().split()
-                    doc_vectors[doc_num][term] = float(tfidf)
-                    if term not in idf_weights:
-                        idf_weights[term] = float(idf)
+            for term, idf in zip(terms, idfs.tolist()):
+                # Terms are kept as small int ids from here on. setdefault
+                # hashes the term once, a new term gets the next id
+                col = vocab.setdefault(term, len(vocab))
+                if col == len(idf_weights):
+                    idf_weights.append(idf)
+                cols.append(col)
+            rows.append(np.full(len(terms), row, dtype=np.int32))
+            values.append(tfidfs)
+    
+    # Normalize rows once at load time, so that a dot product with a unit
+    # query is the cosine and no norm is ever computed per query
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+    values = np.concatenate(values) if values else np.empty(0, dtype=np.float64)
+    doc_norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(doc_index)))
+    doc_norms[doc_norms == 0] = 1.0
+    values /= doc_norms[rows]
+    
+    # float32 values and int32 columns halve the memory (and bandwidth) of
+    # the matrix compared to float64/int64
+    doc_matrix = sp.coo_matrix(
+        (values.astype(np.float32), (rows, np.array(cols, dtype=np.int32))),
+        shape=(len(doc_index), len(vocab)),
+    ).tocsr()
+    doc_matrix.sort_indices()
+    
+    return doc_matrix, doc_index, vocab, np.array(idf_weights, dtype=np.float64)
+
+def load_lemma_map(path: str, vocab: Dict[str, int]) -> Dict[str, int]:
+    """
+    Load the "term lemma" pairs written by the TF-IDF calculator and map
+    every term to the id of its lemma. Returns an empty map if there is no file.
+    """
+    surface_ids = {}
+    if not os.path.exists(path):
+        return surface_ids
+    with open(path, "r", encoding="utf-8") as f:
+        fields = f.read().split()
+    for term, lemma in zip(fields[0::2], fields[1::2]):
+        lemma_id = vocab.get(lemma)
+        if lemma_id is not None:
+            surface_ids[term] = lemma_id
+    return surface_ids
+
+def load_corpus(directory: str, use_lemmas: bool = True) -> Tuple[
+        sp.csr_matrix, List[str], Dict[str, int], np.ndarray, Dict[str, int]]:
+    """
+    Same as load_tfidf_vectors, but reuses the corpus cached in the directory
+    as long as no TF-IDF file was added, removed or modified since it was saved.
+    With lemmas also returns the term to lemma id map of load_lemma_map.
+    """
+    kind = "lemmas" if use_lemmas else "terms"
+    prefix = f"tfidf_{kind}_"
+    matrix_file = os.path.join(directory, f"web_search_{kind}.npz")
+    meta_file = os.path.join(directory, f"web_search_{kind}.pkl")
+    
+    # Maps every source file to its mtime, the cache is valid only for these
+    with os.scandir(directory) as entries:
+        sources = {entry.name: entry.stat().st_mtime_ns for entry in entries
+                   if (entry.name.startswith(prefix) and entry.name.endswith(".txt"))
+                   or (use_lemmas and entry.name == "lemma_map.txt")}
+    
+    if os.path.exists(meta_file) and os.path.exists(matrix_file):
+        try:
+            with open(meta_file, "rb") as f:
+                meta = pickle.load(f)
+            if meta["sources"] == sources:
+                doc_matrix = sp.load_npz(matrix_file).tocsr()
+                doc_matrix.sort_indices()
+                return (doc_matrix, meta["doc_index"], meta["vocab"], meta["idf"],
+                        meta["surface_ids"])
+        except Exception as e:
+            print(f"Error loading corpus cache: {e}")
+    
+    doc_matrix, doc_index, vocab, idf_weights = load_tfidf_vectors(directory, use_lemmas)
+    surface_ids = {}
+    if use_lemmas:
+        surface_ids = load_lemma_map(os.path.join(directory, "lemma_map.txt"), vocab)
     
-    return doc_vectors, idf_weights
+    try:
+        # Write next to the cache first and swap the files in at the end, so
+        # a crash never leaves a half written cache behind
+        with open(f"{matrix_file}.tmp", "wb") as f:
+            sp.save_npz(f, doc_matrix, compressed=False)
+        with open(f"{meta_file}.tmp", "wb") as f:
+            pickle.dump({"sources": sources, "doc_index": doc_index, "vocab": vocab,
+                         "idf": idf_weights, "surface_ids": surface_ids},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{matrix_file}.tmp", matrix_file)
+        os.replace(f"{meta_file}.tmp", meta_file)
+    except Exception as e:
+        print(f"Error saving corpus cache: {e}")
+    
+    return doc_matrix, doc_index, vocab, idf_weights, surface_ids
 
 def load_urls(index_file: str) -> Dict[str, str]:
     """Load document numbers to URLs mapping from index file."""
@@ -51,62 +217,135 @@ def load_urls(index_file: str) -> Dict[str, str]:
             urls[num] = url
     return urls
 
-def get_wordnet_pos(word):
-    """Map POS tag to first character used by WordNetLemmatizer."""
-    tag = nltk.pos_tag([word])[0][1][0].upper()
-    tag_dict = {"J": wordnet.ADJ,
-                "N": wordnet.NOUN,
-                "V": wordnet.VERB,
-                "R": wordnet.ADV}
-    return tag_dict.get(tag, wordnet.NOUN)
-
-def compute_query_vector(query: str, idf_weights: Dict[str, float], use_lemmas: bool = True) -> Dict[str, float]:
-    """Convert query into TF-IDF vector."""
-    # Tokenize and optionally lemmatize query
-    tokens = word_tokenize(query.lower())
+def compute_query_vector(query: str, index: Index,
+                         use_lemmas: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert query into an L2-normalized sparse TF-IDF vector over the vocabulary.
+    Returns the sorted term ids of its non-zero entries and their values.
+    """
+    # Tokenize the query and map tokens to term ids, optionally through lemmas
+    tokens = TOKEN_RE.findall(query.lower())
     if use_lemmas:
-        lemmatizer = WordNetLemmatizer()
-        tokens = [lemmatizer.lemmatize(token, get_wordnet_pos(token)) for token in tokens]
-    
-    # Compute TF
-    tf = defaultdict(int)
-    for token in tokens:
-        tf[token] += 1
-    total_terms = len(tokens)
-    tf = {term: count/total_terms for term, count in tf.items()}
+        # Words seen in the corpus are looked up in the precomputed lemma
+        # table. The rest (stopwords, unseen words) are lemmatized with
+        # WordNet for every POS; words none of whose lemmas are in the
+        # corpus are dropped, and only words with several candidate lemmas
+        # in the corpus are POS tagged to pick one
+        term_ids = [index.surface_ids.get(token) for token in tokens]
+        ambiguous = []
+        for i, term_id in enumerate(term_ids):
+            if term_id is not None:
+                continue
+            candidates = {index.vocab.get(_lemmatize(tokens[i], pos)) for pos in _TAG_MAP.values()}
+            candidates.discard(None)
+            if len(candidates) == 1:
+                term_ids[i] = candidates.pop()
+            elif candidates:
+                ambiguous.append(i)
+        if ambiguous:
+            # Tag all ambiguous words at once rather than word by word
+            tagged = _TAGGER.tag([tokens[i] for i in ambiguous])
+            for i, (token, tag) in zip(ambiguous, tagged):
+                term_ids[i] = index.vocab.get(_lemmatize(token, _TAG_MAP.get(tag[0].upper(), NOUN)))
+    else:
+        term_ids = [index.vocab.get(token) for token in tokens]
     
-    # Compute TF-IDF
-    query_vector = {}
-    for term, tf_val in tf.items():
-        if term in idf_weights:
-            query_vector[term] = tf_val * idf_weights[term]
+    # Terms unknown to the corpus are dropped before counting
+    ids = np.fromiter((term_id for term_id in term_ids if term_id is not None), dtype=np.int32)
+    inv_total = 1.0 / len(tokens) if tokens else 0.0
     
-    return query_vector
+    # Sparse vector over the same columns as the document matrix. unique
+    # returns the ids already sorted, as the scoring kernel needs them
+    cols, counts = np.unique(ids, return_counts=True)
+    values = counts * inv_total * np.take(index.idf, cols)
+    norm = np.linalg.norm(values)
+    if norm > 0:
+        values /= norm
+    return cols, values.astype(np.float32)
 
-def cosine_similarity(vec1: Dict[str, float], vec2: Dict[str, float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    dot_product = sum(vec1.get(term, 0) * vec2.get(term, 0) for term in set(vec1.keys()) | set(vec2.keys()))
-    norm1 = math.sqrt(sum(val**2 for val in vec1.values()))
-    norm2 = math.sqrt(sum(val**2 for val in vec2.values()))
-    
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    return dot_product / (norm1 * norm2)
+# Serial on purpose: request threads call the kernel concurrently, which
+# numba's parallel threading layers either do not allow or do not survive
+# a fork. nogil lets concurrent requests still score on separate cores.
+@njit(nogil=True, fastmath=True, cache=True)
+def _score_documents(indptr, indices, data, rows, q_idx, q_data, out):
+    """
+    Dot product of the given CSR rows with a sparse query. Only the shorter of
+    the two vectors is walked, its columns are binary searched in the other one.
+    """
+    n_query = len(q_idx)
+    for row in rows:
+        total = 0.0
+        start = indptr[row]
+        end = indptr[row + 1]
+        row_idx = indices[start:end]
+        if n_query <= end - start:
+            for j in range(n_query):
+                k = np.searchsorted(row_idx, q_idx[j])
+                if k < end - start and row_idx[k] == q_idx[j]:
+                    total += data[start + k] * q_data[j]
+        else:
+            for i in range(end - start):
+                k = np.searchsorted(q_idx, row_idx[i])
+                if k < n_query and q_idx[k] == row_idx[i]:
+                    total += data[start + i] * q_data[k]
+        out[row] = total
+
+def build_rare_postings(doc_matrix: sp.csr_matrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build the postings (sorted document rows) of the terms found in fewer than
+    a quarter of the documents. Common terms get empty postings, search never
+    takes the postings path for them. Returns the document frequency of every
+    term id, the start of each term's postings and the concatenated postings.
+    """
+    n_docs, n_terms = doc_matrix.shape
+    doc_freq = np.bincount(doc_matrix.indices, minlength=n_terms).astype(np.int32)
+    rows = np.repeat(np.arange(n_docs, dtype=np.int32), np.diff(doc_matrix.indptr))
+    rare = (4 * doc_freq < n_docs)[doc_matrix.indices]
+    cols = doc_matrix.indices[rare]
+    # Stable sort by term keeps each term's rows in ascending order
+    postings_rows = rows[rare][np.argsort(cols, kind="stable")]
+    postings_indptr = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cols, minlength=n_terms), out=postings_indptr[1:])
+    return doc_freq, postings_indptr, postings_rows
 
-def search(query: str, top_k: int = 10, use_lemmas: bool = True) -> List[Tuple[str, str, float]]:
-    """Search for documents most relevant to the query."""
-    query_vector = compute_query_vector(query, idf_weights, use_lemmas)
+def search(index: Index, query: str, top_k: int = 10,
+           use_lemmas: bool = True) -> List[Dict[str, str]]:
+    """
+    Search the index for documents most relevant to the query.
+    Results are already formatted for display.
+    """
+    q_idx, q_data = compute_query_vector(query, index, use_lemmas)
+    if not len(q_idx):
+        # No query term occurs in the corpus
+        return []
     
-    # Compute similarity scores
-    scores = []
-    for doc_num, doc_vector in doc_vectors.items():
-        score = cosine_similarity(query_vector, doc_vector)
-        if score > 0:  # Only include documents with non-zero similarity
-            scores.append((doc_num, urls.get(doc_num, "Unknown URL"), score))
+    # Cosine similarity with every document
+    scores = np.zeros(len(index.doc_ids), dtype=np.float32)
+    rows = index.all_rows
+    if 4 * int(index.doc_freq[q_idx].sum()) < len(scores):
+        # Selective query: all its terms are rare, so only the documents in
+        # their postings can score above zero
+        rows = np.unique(np.concatenate([
+            index.postings_rows[index.postings_indptr[term_id]:index.postings_indptr[term_id + 1]]
+            for term_id in q_idx.tolist()
+        ]))
+    _score_documents(index.indptr, index.indices, index.data, rows, q_idx, q_data, scores)
     
-    # Sort by score in descending order
-    scores.sort(key=lambda x: x[2], reverse=True)
-    return scores[:top_k]
+    # Only documents with non-zero similarity are results, select the top_k
+    # best of those in linear time and sort only the selected ones
+    top = np.flatnonzero(scores > 0)
+    if top_k < len(top):
+        top = top[np.argpartition(-scores[top], top_k - 1)[:top_k]]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    
+    return [{'url': url, 'score': f"{score:.4f}", 'doc_num': doc_num}
+            for doc_num, url, score in zip(index.doc_ids[top].tolist(), index.urls[top].tolist(),
+                                           scores[top].tolist())]
+
+@lru_cache(maxsize=1024)
+def _cached_search(query: str, top_k: int, use_lemmas: bool) -> Tuple[Dict[str, str], ...]:
+    """Memoized search, popular queries repeat a lot."""
+    return tuple(search(search_index, query, top_k, use_lemmas))
 
 @app.route('/')
 def index():
@@ -118,195 +357,65 @@ def search_endpoint():
     use_lemmas = request.form.get('use_lemmas', 'true').lower() == 'true'
     top_k = int(request.form.get('top_k', 10))
     
-    results = search(query, top_k, use_lemmas)
+    results = _cached_search(query, top_k, use_lemmas)
     
-    # Format results for display
-    formatted_results = []
-    for doc_num, url, score in results:
-        formatted_results.append({
-            'url': url,
-            'score': f"{score:.4f}",
-            'doc_num': doc_num
-        })
-    
-    return jsonify({
+    # orjson serializes much faster than the stdlib json behind jsonify
+    return Response(orjson.dumps({
         'query': query,
-        'results': formatted_results
-    })
+        'results': results
+    }), mimetype='application/json')
 
 def init_app():
     """Initialize the application by loading necessary data."""
-    global doc_vectors, idf_weights, urls
+    global search_index, _TAGGER
+    
+    _ensure_nltk()
+    # Load WordNet and the tagger here, before any worker forks or request
+    # thread starts: NLTK loads corpora lazily and without a lock, so
+    # concurrent first requests could race on it
+    _LEMMATIZER.lemmatize("a")
+    _TAGGER = PerceptronTagger()
     
     # Load data
     tfidf_dir = "output"  # Directory containing TF-IDF files
     index_file = "index.txt"  # Path to index file
     
-    doc_vectors, idf_weights = load_tfidf_vectors(tfidf_dir)
+    doc_matrix, doc_index, vocab, idf_weights, surface_ids = load_corpus(tfidf_dir)
     urls = load_urls(index_file)
+    doc_freq, postings_indptr, postings_rows = build_rare_postings(doc_matrix)
+    search_index = Index(
+        indptr=doc_matrix.indptr,
+        indices=doc_matrix.indices,
+        data=doc_matrix.data,
+        all_rows=np.arange(len(doc_index), dtype=np.int32),
+        doc_freq=doc_freq,
+        postings_indptr=postings_indptr,
+        postings_rows=postings_rows,
+        doc_ids=np.array(doc_index, dtype=object),
+        urls=np.array([urls.get(doc_num, "Unknown URL") for doc_num in doc_index], dtype=object),
+        vocab=vocab,
+        idf=idf_weights,
+        surface_ids=surface_ids,
+    )
+    # Compile the scoring kernel now rather than on the first query
+    _score_documents(search_index.indptr, search_index.indices, search_index.data,
+                     search_index.all_rows,
+                     np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32),
+                     np.zeros(len(doc_index), dtype=np.float32))
+    # Results cached for the previous corpus are stale now
+    _cached_search.cache_clear()
 
-if __name__ == '__main__':
-    # Create templates directory if it doesn't exist
-    os.makedirs('templates', exist_ok=True)
-    
-    # Create index.html template
-    with open('templates/index.html', 'w', encoding='utf-8') as f:
-        f.write('''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Vector Search</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        .search-container {
-            text-align: center;
-            margin-bottom: 20px;
-        }
-        #search-input {
-            width: 70%;
-            padding: 10px;
-            font-size: 16px;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-        }
-        #search-button {
-            padding: 10px 20px;
-            font-size: 16px;
-            background-color: #4285f4;
-            color: white;
-            border: none;
-            border-radius: 4px;
-            cursor: pointer;
-        }
-        #search-button:hover {
-            background-color: #3367d6;
-        }
-        .results {
-            margin-top: 20px;
-        }
-        .result-item {
-            margin-bottom: 20px;
-            padding: 15px;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-        }
-        .result-url {
-            color: #1a0dab;
-            text-decoration: none;
-            font-size: 18px;
-        }
-        .result-url:hover {
-            text-decoration: underline;
-        }
-        .result-score {
-            color: #006621;
-            font-size: 14px;
-        }
-        .loading {
-            text-align: center;
-            display: none;
-        }
-        .options {
-            margin: 10px 0;
-        }
-        .options label {
-            margin-right: 15px;
-        }
-    </style>
-</head>
-<body>
-    <div class="search-container">
-        <h1>Vector Search</h1>
-        <form id="search-form">
-            <input type="text" id="search-input" placeholder="Enter your search query...">
-            <button type="submit" id="search-button">Search</button>
-            <div class="options">
-                <label>
-                    <input type="checkbox" id="use-lemmas" checked>
-                    Use Lemmas
-                </label>
-                <label>
-                    Number of results:
-                    <input type="number" id="top-k" value="10" min="1" max="50">
-                </label>
-            </div>
-        </form>
-    </div>
-    
-    <div class="loading" id="loading">
-        Searching...
-    </div>
-    
-    <div class="results" id="results">
-        <!-- Results will be inserted here -->
-    </div>
+def create_app() -> Flask:
+    """
+    Load the data and return the application, for WSGI servers such as
+    gunicorn ("web_search:create_app()"). Importing the module loads nothing.
+    """
+    init_app()
+    return app
 
-    <script>
-        document.getElementById('search-form').addEventListener('submit', function(e) {
-            e.preventDefault();
-            const query = document.getElementById('search-input').value;
-            const useLemmas = document.getElementById('use-lemmas').checked;
-            const topK = document.getElementById('top-k').value;
-            
-            // Show loading indicator
-            document.getElementById('loading').style.display = 'block';
-            document.getElementById('results').innerHTML = '';
-            
-            // Send search request
-            fetch('/search', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                },
-                body: new URLSearchParams({
-                    'query': query,
-                    'use_lemmas': useLemmas,
-                    'top_k': topK
-                })
-            })
-            .then(response => response.json())
-            .then(data => {
-                // Hide loading indicator
-                document.getElementById('loading').style.display = 'none';
-                
-                // Display results
-                const resultsDiv = document.getElementById('results');
-                if (data.results.length === 0) {
-                    resultsDiv.innerHTML = '<p>No results found.</p>';
-                    return;
-                }
-                
-                let html = '';
-                data.results.forEach(result => {
-                    html += `
-                        <div class="result-item">
-                            <a href="${result.url}" class="result-url" target="_blank">${result.url}</a>
-                            <div class="result-score">Relevance score: ${result.score}</div>
-                        </div>
-                    `;
-                });
-                resultsDiv.innerHTML = html;
-            })
-            .catch(error => {
-                document.getElementById('loading').style.display = 'none';
-                document.getElementById('results').innerHTML = '<p>An error occurred during the search.</p>';
-                console.error('Error:', error);
-            });
-        });
-    </script>
-</body>
-</html>
-        ''')
-    
+if __name__ == '__main__':
     # Initialize the application
     init_app()
     
-    # Run the Flask app
-    app.run(debug=True) 
+    # Run the Flask development server
+    app.run(debug=True)